@@ -8,7 +8,12 @@ Run:  python app.py
 Open: http://localhost:5000
 """
 
-import json
+import atexit
+import glob
+import hashlib
+import heapq
+import itertools
+import mimetypes
 import multiprocessing
 # Must be called before any other multiprocessing code.
 # 'spawn' creates a clean Python process instead of forking from gunicorn's
@@ -22,113 +27,135 @@ import threading
 import time
 import traceback
 import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from queue import Queue, Empty
 
+import orjson
 from flask import (
-    Flask, render_template, request, jsonify, Response, send_from_directory
+    Flask, render_template, request, jsonify, Response, abort, send_file,
+    send_from_directory,
 )
-from playwright.sync_api import sync_playwright
+from werkzeug.security import safe_join
 
 import database
+import reports
 import scanner
+from browser_pool import BrowserWorkerPool
 
 MAX_SCAN_TIME = 90  # Hard kill after 90 seconds — same as CLI
 
-
-def _scan_worker(url, mp_result_queue, mp_status_queue):
-    """
-    Runs in a SEPARATE PROCESS. Launches its own browser, runs the scan,
-    sends status updates and the final result via multiprocessing queues.
-    If this process hangs, the parent kills it with SIGKILL.
-    """
-    try:
-        database.init_db()
-
-        def status_callback(message, step, total_steps, elapsed=0):
-            try:
-                mp_status_queue.put({
-                    "message": message,
-                    "step": step,
-                    "total_steps": total_steps,
-                    "elapsed": round(elapsed, 1),
-                }, block=False)
-            except Exception:
-                pass  # Don't let queue errors kill the scan
-
-        with sync_playwright() as pw:
-            browser = pw.chromium.launch(headless=True)
-            result = scanner.scan_url(browser, url, status_callback=status_callback)
-            browser.close()
-        mp_result_queue.put(result)
-    except Exception as e:
-        mp_result_queue.put({
-            "url": url,
-            "error": str(e),
-            "still_tracking": "unknown",
-            "tiktok_trackers_after": [],
-        })
+# One pool per server process. Each worker keeps a Chromium instance alive
+# between scans; scans beyond the pool size wait for a free worker.
+SCAN_POOL_SIZE = min(os.cpu_count() or 1, 4)
+RECYCLE_AFTER_SCANS = 20  # Restart a worker's Chromium after this many scans
+scan_pool = BrowserWorkerPool(SCAN_POOL_SIZE, recycle_after=RECYCLE_AFTER_SCANS)
+atexit.register(scan_pool.shutdown)
+
+# The pool caps running browsers, but every accepted scan still holds a
+# thread and an SSE queue while it waits for a worker. Past this many
+# running + waiting single scans, new ones get a 429 instead of queueing.
+# Each of those scans' SSE streams also holds a gunicorn thread, so this
+# must stay well below --threads (16 in the Dockerfile): at the cap there
+# have to be threads left to send the 429 itself, batch streams and
+# /result, /pdf and /evidence. The default (at most 8) leaves half free.
+MAX_PENDING_SCANS = int(os.environ.get("MAX_PENDING_SCANS", SCAN_POOL_SIZE * 2))
+_scan_slots = threading.BoundedSemaphore(MAX_PENDING_SCANS)
+
+# PDF and evidence ZIP builds run in worker processes (see reports.py) so
+# they use every core and don't hold the GIL against SSE streams.
+REPORT_POOL_SIZE = min(os.cpu_count() or 1, 4)
+_report_pool = ProcessPoolExecutor(max_workers=REPORT_POOL_SIZE)
+_report_pool_lock = threading.Lock()
+atexit.register(lambda: _report_pool.shutdown(wait=False, cancel_futures=True))
 
 app = Flask(__name__)
+# Behind Apache with mod_xsendfile, set USE_X_SENDFILE=1 so everything sent
+# with send_file (reports, evidence ZIPs, screenshots) is streamed by Apache.
+# For nginx see SCREENSHOT_ACCEL_PREFIX below.
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
 
 # Directory for pre-generated evidence packages.
 EVIDENCE_DIR = os.path.join(os.path.dirname(__file__), "evidence")
 os.makedirs(EVIDENCE_DIR, exist_ok=True)
 
+# Scan results are stored in SQLite, so the tables must exist before the
+# first scan finishes. (gunicorn never runs the __main__ block below.)
+database.init_db()
 
-def _sanitize_for_pdf(text):
-    """Replace Unicode characters that Helvetica can't render."""
-    replacements = {
-        "\u2014": "--", "\u2013": "-", "\u2018": "'", "\u2019": "'",
-        "\u201c": '"', "\u201d": '"', "\u2026": "...", "\u00a0": " ",
-        "\u2192": "->", "\u2190": "<-", "\u2194": "<->",
-        "\u2022": "*", "\u25cf": "*", "\u2713": "[x]", "\u2717": "[ ]",
-        "\u00b7": ".",
-    }
-    for char, repl in replacements.items():
-        text = text.replace(char, repl)
-    return text.encode("latin-1", errors="replace").decode("latin-1")
+
+# Recently saved/loaded results, so repeated PDF/evidence downloads don't
+# go back to SQLite and re-parse the JSON every time.
+RESULT_CACHE_SIZE = 128
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _cache_result(scan_id, result):
+    with _result_cache_lock:
+        _result_cache[scan_id] = result
+        _result_cache.move_to_end(scan_id)
+        if len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
 
 
 def _save_result_to_disk(scan_id, result):
-    """Persist the scan result dict as JSON so downloads survive server restarts."""
+    """Persist the scan result dict in SQLite so downloads survive server restarts."""
+    _cache_result(scan_id, result)
     try:
-        result_path = os.path.join(EVIDENCE_DIR, f"{scan_id}_result.json")
-        with open(result_path, "w") as f:
-            json.dump(result, f)
+        database.save_result_payload(scan_id, orjson.dumps(result).decode())
     except Exception as e:
-        print(f"[!] Failed to save result JSON for {scan_id}: {e}")
+        print(f"[!] Failed to save result for {scan_id}: {e}")
 
 
 def _load_result_from_disk(scan_id):
-    """Load a previously saved scan result from disk. Returns dict or None."""
-    result_path = os.path.join(EVIDENCE_DIR, f"{scan_id}_result.json")
-    if not os.path.exists(result_path):
-        return None
+    """Load a previously saved scan result. Returns dict or None."""
+    with _result_cache_lock:
+        if scan_id in _result_cache:
+            _result_cache.move_to_end(scan_id)
+            return _result_cache[scan_id]
+
+    result = None
     try:
-        with open(result_path, "r") as f:
-            return json.load(f)
+        payload = database.get_result_payload(scan_id)
+        if payload is not None:
+            result = orjson.loads(payload)
     except Exception as e:
-        print(f"[!] Failed to load result JSON for {scan_id}: {e}")
-        return None
+        print(f"[!] Failed to load result for {scan_id}: {e}")
+
+    if result is None:
+        # Scans saved before results moved into SQLite.
+        result_path = os.path.join(EVIDENCE_DIR, f"{scan_id}_result.json")
+        if not os.path.exists(result_path):
+            return None
+        try:
+            with open(result_path, "rb") as f:
+                result = orjson.loads(f.read())
+        except Exception as e:
+            print(f"[!] Failed to load result JSON for {scan_id}: {e}")
+            return None
+
+    _cache_result(scan_id, result)
+    return result
 
 
 def _pregenerate_evidence(scan_id, result):
     """Pre-generate the evidence ZIP in a background thread so it's ready for download."""
-    # Always save the result JSON to disk (needed for PDF/evidence regeneration).
+    # Always save the result (needed for PDF/evidence regeneration).
     _save_result_to_disk(scan_id, result)
 
+    # PDFs are built on first download (see _get_or_build_pdf) — most
+    # results are never downloaded as a report.
     if result.get("still_tracking") not in ("yes", "inconclusive"):
         return  # No violations — no evidence to generate.
 
     def _generate():
         try:
-            from evidence import generate_evidence_package
-            zip_bytes = generate_evidence_package(result)
-            out_path = os.path.join(EVIDENCE_DIR, f"{scan_id}.zip")
-            with open(out_path, "wb") as f:
-                f.write(zip_bytes)
-            print(f"[*] Evidence pre-generated: {out_path} ({len(zip_bytes)} bytes)")
+            out_path = _build_evidence_zip(scan_id, result)
+            print(f"[*] Evidence pre-generated: {out_path} ({os.path.getsize(out_path)} bytes)")
         except Exception as e:
             print(f"[!] Evidence pre-generation failed for {scan_id}: {e}")
             traceback.print_exc()
@@ -141,6 +168,201 @@ def _pregenerate_evidence(scan_id, result):
 # ────────────────────────────────────────────────────────────────────
 active_scans = {}
 active_batch_scans = {}
+# Guards inserts/removals on both stores (request threads, batch threads and
+# the reaper all mutate them). Reads use .get() and don't need it.
+_scans_lock = threading.RLock()
+
+# Finished scans are dropped from memory SCAN_RETENTION seconds after they
+# finish, whether or not anyone opened their stream. A single reaper thread
+# sleeps until the earliest expiry instead of parking one sleeping thread
+# per scan. Results stay downloadable afterwards via _load_result_from_disk.
+SCAN_RETENTION = 600  # Keep results for 10 minutes
+MAX_RETAINED_SCANS = 1024  # Hard cap on entries per store, oldest finished go first
+
+_reaper_heap = []  # (expire_ts, seq, store, key); store None = a scan's cached PDFs
+_reaper_seq = itertools.count()  # Tie-breaker so dicts are never compared
+_reaper_cv = threading.Condition()
+
+
+def _reaper_loop():
+    while True:
+        with _reaper_cv:
+            while not _reaper_heap or _reaper_heap[0][0] > time.time():
+                timeout = _reaper_heap[0][0] - time.time() if _reaper_heap else None
+                _reaper_cv.wait(timeout=timeout)
+            _, _, store, key = heapq.heappop(_reaper_heap)
+        if store is None:
+            _remove_cached_pdfs(key)
+            continue
+        with _scans_lock:
+            store.pop(key, None)
+
+
+def _remove_cached_pdfs(scan_id):
+    """
+    Delete a scan's cached PDF reports. Scheduled SCAN_RETENTION seconds
+    after each build; they're rebuilt from the saved result if the report
+    is downloaded again.
+    """
+    for path in glob.glob(os.path.join(EVIDENCE_DIR, glob.escape(scan_id) + "_*.pdf")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _schedule_cleanup(store, key, delay=SCAN_RETENTION):
+    """
+    Remove `key` from `store` (active_scans / active_batch_scans) after
+    `delay` seconds. With store=None, delete scan `key`'s cached PDFs instead.
+    """
+    with _reaper_cv:
+        heapq.heappush(_reaper_heap, (time.time() + delay, next(_reaper_seq), store, key))
+        _reaper_cv.notify()
+
+
+def _register(store, key, entry):
+    """Add an entry to active_scans / active_batch_scans, evicting old finished ones."""
+    with _scans_lock:
+        store[key] = entry
+        _evict_finished(store)
+
+
+def _evict_finished(store):
+    """Drop the oldest finished entries once `store` grows past MAX_RETAINED_SCANS."""
+    with _scans_lock:
+        excess = len(store) - MAX_RETAINED_SCANS
+        if excess <= 0:
+            return
+        for key, entry in list(store.items()):
+            if excess <= 0:
+                break
+            if entry.get("done"):
+                store.pop(key, None)
+                excess -= 1
+
+
+threading.Thread(target=_reaper_loop, daemon=True).start()
+
+# Progress updates stop being queued once a stream has this many messages
+# waiting, so a slow or vanished client can't make a scan's events pile up
+# in memory; see _publish.
+SSE_MAX_QUEUED = 256
+
+
+def _publish(q, msg):
+    """
+    Queue an SSE message without letting a slow or absent client stall a scan.
+
+    Progress updates are dropped while SSE_MAX_QUEUED messages are already
+    waiting — the next one supersedes them anyway, and the reader collapses
+    any backlog into a single frame. Results, errors and the None sentinel
+    are always queued, without blocking: there are only a handful per scan
+    (one per domain in a batch), and the stream needs them to finish.
+    """
+    if msg is not None and msg.get("event") in ("status", "batch_status"):
+        if q.qsize() >= SSE_MAX_QUEUED:
+            return
+    q.put_nowait(msg)
+
+
+# Progress updates that arrive close together are collapsed into one write
+# instead of one tiny write (and proxy flush) per status step.
+SSE_BATCH_WINDOW = 0.05  # Seconds to wait for more events before flushing
+
+# Frames are built as bytes so nothing is re-encoded per message.
+_SSE_FRAME = b"event: %s\ndata: %s\n\n"
+_SSE_DONE = b'event: done\ndata: {"status":"finished"}\n\n'
+_SSE_KEEPALIVE = b": keepalive\n\n"
+_SSE_PROGRESS_EVENTS = frozenset(("status", "batch_status"))
+_SSE_EVENT_NAMES = {
+    name: name.encode()
+    for name in ("status", "complete", "scan_error", "batch_status",
+                 "domain_complete", "batch_complete", "batch_error")
+}
+
+
+def _format_sse(msg, default_event):
+    event_type = msg.get("event", default_event)
+    event_name = _SSE_EVENT_NAMES.get(event_type) or event_type.encode()
+    # "raw" carries data that was already encoded (e.g. a scan result).
+    data = msg.get("raw") or orjson.dumps(msg.get("data", {}))
+    return _SSE_FRAME % (event_name, data)
+
+
+def _read_sse_batch(q, default_event):
+    """
+    Block for the next message on an SSE queue, then collect anything else
+    that arrives within SSE_BATCH_WINDOW and format it all as one chunk.
+
+    The UI only ever shows the latest progress update, so within a window
+    each status / batch_status message replaces the previous one and only
+    the last is encoded and sent. Any other event (result, error, the None
+    sentinel) is sent straight away, after any pending progress update.
+
+    Returns (chunk, finished). Raises Empty after 120s of silence.
+    """
+    progress = None
+    msg = q.get(timeout=120)
+    deadline = time.monotonic() + SSE_BATCH_WINDOW
+    while True:
+        if msg is not None and msg.get("event", default_event) in _SSE_PROGRESS_EVENTS:
+            progress = msg
+        else:
+            frames = [_format_sse(progress, default_event)] if progress else []
+            if msg is None:
+                frames.append(_SSE_DONE)
+                return b"".join(frames), True
+            frames.append(_format_sse(msg, default_event))
+            return b"".join(frames), False
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            msg = q.get(timeout=remaining)
+        except Empty:
+            break
+    return _format_sse(progress, default_event), False
+
+
+def _sse_stream(q, default_event):
+    """Yield SSE chunks from a scan / batch queue until its None sentinel."""
+    while True:
+        try:
+            chunk, finished = _read_sse_batch(q, default_event)
+        except Empty:
+            # Keepalive to prevent proxy/browser timeout.
+            yield _SSE_KEEPALIVE
+            continue
+        yield chunk
+        if finished:
+            break
+
+
+def _gzip_stream(chunks):
+    """
+    gzip a chunk stream, sync-flushing after every chunk so each SSE event
+    reaches the browser immediately instead of waiting in the zlib window.
+    """
+    compressor = zlib.compressobj(level=1, wbits=31)  # wbits=31 -> gzip framing
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _sse_response(chunks):
+    """Wrap an SSE chunk generator in a streaming Response, gzipped when the client accepts it."""
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "Connection": "keep-alive",
+    }
+    if "gzip" in request.accept_encodings:
+        chunks = _gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(chunks, mimetype="text/event-stream", headers=headers)
 
 
 # ────────────────────────────────────────────────────────────────────
@@ -170,86 +392,55 @@ def start_scan():
     # Normalise the URL (add https:// if missing).
     url = scanner.normalize_url(url)
 
+    if not _scan_slots.acquire(blocking=False):
+        response = jsonify({"error": "Server is busy with other scans -- please retry shortly"})
+        response.headers["Retry-After"] = "10"
+        return response, 429
+
     scan_id = str(uuid.uuid4())
     q = Queue()
 
-    active_scans[scan_id] = {
+    _register(active_scans, scan_id, {
         "queue": q,
         "result": None,
         "error": None,
         "done": False,
-    }
+    })
 
     def run_scan():
-        """Background thread: runs scan in a SEPARATE PROCESS with hard kill timeout."""
+        """Background thread: runs scan on a pooled worker process with hard kill timeout."""
         try:
-            mp_result_queue = multiprocessing.Queue()
-            mp_status_queue = multiprocessing.Queue()
-
-            proc = multiprocessing.Process(
-                target=_scan_worker,
-                args=(url, mp_result_queue, mp_status_queue),
-            )
-            proc.start()
-            start_time = time.time()
-
-            # Relay status updates from the subprocess to the SSE queue
-            while proc.is_alive():
-                # Check timeout
-                elapsed = time.time() - start_time
-                if elapsed > MAX_SCAN_TIME:
-                    proc.kill()
-                    proc.join()
-                    q.put({"event": "scan_error", "data": {
-                        "message": f"Scan timed out after {MAX_SCAN_TIME}s — killed"
-                    }})
-                    active_scans[scan_id]["error"] = f"Timeout after {MAX_SCAN_TIME}s"
-                    return
-
-                # Drain status messages
-                while not mp_status_queue.empty():
-                    try:
-                        status = mp_status_queue.get_nowait()
-                        q.put({"event": "status", "data": status})
-                    except Exception:
-                        break
-
-                time.sleep(0.2)
-
-            proc.join()
-
-            # Drain any remaining status messages
-            while not mp_status_queue.empty():
-                try:
-                    status = mp_status_queue.get_nowait()
-                    q.put({"event": "status", "data": status})
-                except Exception:
-                    break
-
-            # Get the result
             try:
-                result = mp_result_queue.get(timeout=5)
-            except Exception:
-                result = {
-                    "url": url,
-                    "still_tracking": "unknown",
-                    "tiktok_trackers_after": [],
-                    "error": "Scan process ended without returning results",
-                }
-
+                result = scan_pool.run(
+                    url,
+                    on_status=lambda status: _publish(q, {"event": "status", "data": status}),
+                    timeout=MAX_SCAN_TIME,
+                )
+            except scanner.ScanTimeout:
+                _publish(q, {"event": "scan_error", "data": {
+                    "message": f"Scan timed out after {MAX_SCAN_TIME}s — killed"
+                }})
+                active_scans[scan_id]["error"] = f"Timeout after {MAX_SCAN_TIME}s"
+                return
+
+            # Encoded once here and reused by the SSE stream and /result.
+            result_json = orjson.dumps(result)
+            active_scans[scan_id]["result_json"] = result_json
             active_scans[scan_id]["result"] = result
-            q.put({"event": "complete", "data": result})
+            _publish(q, {"event": "complete", "raw": result_json})
 
             # Pre-generate evidence package in background.
             _pregenerate_evidence(scan_id, result)
 
         except Exception as e:
             active_scans[scan_id]["error"] = str(e)
-            q.put({"event": "scan_error", "data": {"message": str(e)}})
+            _publish(q, {"event": "scan_error", "data": {"message": str(e)}})
 
         finally:
+            _scan_slots.release()
             active_scans[scan_id]["done"] = True
-            q.put(None)  # sentinel — ends the SSE stream
+            _publish(q, None)  # sentinel — ends the SSE stream
+            _schedule_cleanup(active_scans, scan_id)
 
     thread = threading.Thread(target=run_scan, daemon=True)
     thread.start()
@@ -269,52 +460,24 @@ def scan_stream(scan_id):
       scan_error — scan failed
       done       — terminal event, close the stream
     """
-    if scan_id not in active_scans:
+    scan = active_scans.get(scan_id)
+    if scan is None:
         return jsonify({"error": "Scan not found"}), 404
 
-    def generate():
-        q = active_scans[scan_id]["queue"]
-        while True:
-            try:
-                msg = q.get(timeout=120)
-                if msg is None:
-                    yield f"event: done\ndata: {json.dumps({'status': 'finished'})}\n\n"
-                    break
-                event_type = msg.get("event", "status")
-                data = msg.get("data", {})
-                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
-            except Empty:
-                # Keepalive to prevent proxy/browser timeout.
-                yield ": keepalive\n\n"
-
-        # Clean up after a delay (keep results for 10 minutes).
-        def cleanup():
-            import time
-            time.sleep(600)
-            active_scans.pop(scan_id, None)
-
-        threading.Thread(target=cleanup, daemon=True).start()
-
-    return Response(
-        generate(),
-        mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
-    )
+    return _sse_response(_sse_stream(scan["queue"], "status"))
 
 
 @app.route("/api/scan/<scan_id>/result")
 def scan_result(scan_id):
     """Get the final result of a completed scan as JSON."""
-    if scan_id in active_scans:
-        scan = active_scans[scan_id]
+    scan = active_scans.get(scan_id)
+    if scan is not None:
         if not scan["done"]:
             return jsonify({"status": "in_progress"}), 202
         if scan["error"]:
             return jsonify({"error": scan["error"]}), 500
+        if scan.get("result_json"):
+            return Response(scan["result_json"], mimetype="application/json")
         return jsonify(scan["result"])
 
     # Not in memory — check disk.
@@ -325,9 +488,27 @@ def scan_result(scan_id):
     return jsonify({"error": "Scan not found"}), 404
 
 
+# When running behind nginx, set this to an `internal` location aliased to
+# the screenshots directory, e.g.
+#   location /_internal_screenshots/ { internal; alias /app/screenshots/; }
+# and nginx streams the file itself instead of tying up a Flask thread.
+SCREENSHOT_ACCEL_PREFIX = os.environ.get("SCREENSHOT_ACCEL_PREFIX")
+
+
 @app.route("/screenshots/<path:filename>")
 def serve_screenshot(filename):
     """Serve screenshot images from the screenshots directory."""
+    if SCREENSHOT_ACCEL_PREFIX:
+        path = safe_join("screenshots", filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = Response(
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        response.headers["X-Accel-Redirect"] = (
+            f"{SCREENSHOT_ACCEL_PREFIX.rstrip('/')}/{filename}"
+        )
+        return response
     return send_from_directory("screenshots", filename)
 
 
@@ -336,8 +517,8 @@ def download_pdf(scan_id):
     """Generate and return a PDF privacy compliance report."""
     # Try in-memory first, then fall back to disk.
     result = None
-    if scan_id in active_scans:
-        scan = active_scans[scan_id]
+    scan = active_scans.get(scan_id)
+    if scan is not None:
         if not scan["done"] or not scan["result"]:
             return jsonify({"error": "Scan not yet complete", "retry": True}), 202
         result = scan["result"]
@@ -348,190 +529,56 @@ def download_pdf(scan_id):
         return jsonify({"error": "Scan not found", "retry": False}), 404
 
     try:
-        pdf_bytes = _generate_pdf_report(result)
+        pdf_path = _get_or_build_pdf(scan_id, result)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": f"PDF generation failed: {e}", "retry": False}), 500
 
-    domain = scanner.get_domain(result["url"]).replace(":", "_")
+    domain = reports.domain_for_filename(result)
 
-    return Response(
-        pdf_bytes,
+    return send_file(
+        pdf_path,
         mimetype="application/pdf",
-        headers={
-            "Content-Disposition": f'attachment; filename="privacy-report-{domain}.pdf"'
-        },
+        as_attachment=True,
+        download_name=f"privacy-report-{domain}.pdf",
+        conditional=True,
     )
 
 
-def _generate_pdf_report(result):
-    """Build the PDF bytes for a scan result. Raises on failure."""
-    from fpdf import FPDF
-
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    # ── Title ──────────────────────────────────────────────────
-    pdf.set_font("Helvetica", "B", 22)
-    pdf.cell(0, 15, "Privacy Compliance Report", ln=True, align="C")
-    pdf.ln(3)
-
-    # ── URL and date ───────────────────────────────────────────
-    pdf.set_font("Helvetica", "", 11)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 8, f"URL: {result['url']}", ln=True)
-    pdf.cell(0, 8, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-    pdf.ln(5)
-
-    # ── Verdict banner ─────────────────────────────────────────
-    if result["still_tracking"] == "yes":
-        pdf.set_fill_color(255, 71, 87)
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.cell(0, 12, "  VIOLATION: TikTok tracking continues after opt-out", ln=True, fill=True)
-    elif result["still_tracking"] == "inconclusive":
-        pdf.set_fill_color(255, 165, 2)
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.cell(0, 12, "  INCONCLUSIVE: Opt-out could not be verified", ln=True, fill=True)
-    else:
-        pdf.set_fill_color(46, 213, 115)
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font("Helvetica", "B", 13)
-        pdf.cell(0, 12, "  CLEAN: No TikTok tracking after opt-out", ln=True, fill=True)
-    pdf.set_text_color(0, 0, 0)
-    pdf.ln(8)
-
-    # ── Scan details ───────────────────────────────────────────
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, "Scan Details", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    pdf.cell(0, 7, f"Opt-out banner found: {result['opt_out_found']}", ln=True)
-    pdf.cell(0, 7, f"Opt-out clicked: {result['opt_out_clicked']}", ln=True)
-    pdf.cell(0, 7, f"Trackers before opt-out: {len(result['trackers_before'])}", ln=True)
-    tiktok_after = result.get("tiktok_trackers_after", [])
-    all_after = result.get("trackers_after", [])
-    other_after = [t for t in all_after if t not in tiktok_after]
-    pdf.cell(0, 7, f"TikTok trackers after opt-out: {len(tiktok_after)}", ln=True)
-    pdf.cell(0, 7, f"Other trackers after opt-out: {len(other_after)}", ln=True)
-    pdf.ln(5)
-
-    # ── Trackers before (list) ─────────────────────────────────
-    if result["trackers_before"]:
-        pdf.set_font("Helvetica", "B", 12)
-        pdf.cell(0, 9, "Trackers Before Opt-Out:", ln=True)
-        pdf.set_font("Helvetica", "", 10)
-        for t in result["trackers_before"]:
-            pdf.cell(0, 6, _sanitize_for_pdf(f"  - {t}"), ln=True)
-        pdf.ln(3)
-
-    # ── Flagged domains table ──────────────────────────────────
-    flagged = result.get("flagged_domains", {})
-    if flagged:
-        # Split into TikTok and other trackers
-        tiktok_flagged = {d: i for d, i in flagged.items()
-                         if "tiktok" in d.lower() or "tiktok" in i.get("matched_rule", "").lower()}
-        other_flagged = {d: i for d, i in flagged.items() if d not in tiktok_flagged}
-
-        # TikTok section (primary — red highlight)
-        if tiktok_flagged:
-            pdf.set_font("Helvetica", "B", 14)
-            pdf.cell(0, 10, "TikTok Trackers (Post-Opt-Out) - VIOLATION", ln=True)
-            pdf.ln(2)
-            pdf.set_font("Helvetica", "B", 9)
-            pdf.set_fill_color(255, 71, 87)
-            pdf.set_text_color(255, 255, 255)
-            pdf.cell(85, 8, "  Domain", border=1, fill=True)
-            pdf.cell(25, 8, "Requests", border=1, fill=True, align="C")
-            pdf.cell(70, 8, "  Matched Rule", border=1, fill=True)
-            pdf.ln()
-            pdf.set_text_color(0, 0, 0)
-            pdf.set_font("Helvetica", "", 9)
-            for fdomain, info in sorted(tiktok_flagged.items()):
-                pdf.set_fill_color(255, 240, 240)
-                pdf.cell(85, 7, f"  {fdomain[:42]}", border=1, fill=True)
-                pdf.cell(25, 7, str(info["count"]), border=1, align="C", fill=True)
-                pdf.cell(70, 7, f"  {info['matched_rule'][:34]}", border=1, fill=True)
-                pdf.ln()
-            pdf.ln(5)
-
-        # Other trackers (informational — gray)
-        if other_flagged:
-            pdf.set_font("Helvetica", "B", 12)
-            pdf.set_text_color(120, 120, 120)
-            pdf.cell(0, 10, "Other Trackers Detected (Informational)", ln=True)
-            pdf.set_text_color(0, 0, 0)
-            pdf.ln(2)
-            pdf.set_font("Helvetica", "B", 9)
-            pdf.set_fill_color(100, 100, 110)
-            pdf.set_text_color(255, 255, 255)
-            pdf.cell(85, 8, "  Domain", border=1, fill=True)
-            pdf.cell(25, 8, "Requests", border=1, fill=True, align="C")
-            pdf.cell(70, 8, "  Matched Rule", border=1, fill=True)
-            pdf.ln()
-            pdf.set_text_color(120, 120, 120)
-            pdf.set_font("Helvetica", "", 9)
-            for fdomain, info in sorted(other_flagged.items()):
-                pdf.cell(85, 7, f"  {fdomain[:42]}", border=1)
-                pdf.cell(25, 7, str(info["count"]), border=1, align="C")
-                pdf.cell(70, 7, f"  {info['matched_rule'][:34]}", border=1)
-                pdf.ln()
-            pdf.set_text_color(0, 0, 0)
-            pdf.ln(5)
-
-    # ── Notes ──────────────────────────────────────────────────
-    notes = result.get("notes", [])
-    if notes:
-        # Reset cursor to left margin before multi_cell.
-        pdf.set_x(pdf.l_margin)
-        pdf.set_font("Helvetica", "B", 12)
-        pdf.cell(0, 9, "Notes:", ln=True)
-        pdf.set_font("Helvetica", "", 10)
-        for note in notes:
-            short = note[:200] + "..." if len(note) > 200 else note
-            pdf.set_x(pdf.l_margin)
-            pdf.multi_cell(0, 6, _sanitize_for_pdf(f"  - {short}"))
-        pdf.ln(3)
-
-    # ── Screenshots ────────────────────────────────────────────
-    for label, key in [("Before Opt-Out", "screenshot_before"),
-                       ("After Opt-Out", "screenshot_after"),
-                       ("Product Page", "screenshot_product")]:
-        path = result.get(key)
-        if path and os.path.exists(path):
-            pdf.add_page()
-            pdf.set_font("Helvetica", "B", 14)
-            pdf.cell(0, 10, f"Screenshot: {label}", ln=True)
-            pdf.ln(3)
-            try:
-                pdf.image(path, x=10, w=190)
-            except Exception:
-                pdf.set_font("Helvetica", "", 11)
-                pdf.cell(0, 10, "(Screenshot could not be embedded)", ln=True)
-
-    # ── TikTok Network Evidence (composite) ────────────────────
-    domain_safe = scanner.get_domain(result["url"]).replace(":", "_")
-    evidence_img = os.path.join("screenshots", f"evidence_tiktok_network_{domain_safe}.png")
-    if not os.path.exists(evidence_img):
-        # Try generating it on the fly.
-        try:
-            from evidence import generate_tiktok_evidence_images
-            generate_tiktok_evidence_images(result, "screenshots")
-        except Exception:
-            pass
-    if os.path.exists(evidence_img):
-        pdf.add_page("L")  # Landscape for wide image
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.cell(0, 10, "TikTok Network Evidence (DevTools Capture)", ln=True)
-        pdf.ln(3)
-        try:
-            pdf.image(evidence_img, x=5, w=287)  # Full landscape width
-        except Exception:
-            pdf.set_font("Helvetica", "", 11)
-            pdf.cell(0, 10, "(Evidence image could not be embedded)", ln=True)
+def _pdf_cache_path(scan_id, result):
+    """Path of the cached PDF for this exact result — a changed result gets a new file."""
+    payload = orjson.dumps(result, option=orjson.OPT_SORT_KEYS, default=str)
+    key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return os.path.join(EVIDENCE_DIR, f"{scan_id}_{key}.pdf")
+
+
+def _get_or_build_pdf(scan_id, result):
+    """Return the path of the PDF report for a result, generating it on first use."""
+    pdf_path = _pdf_cache_path(scan_id, result)
+    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0:
+        return pdf_path
+
+    _run_report_job(reports.build_pdf, result, pdf_path)
+    _schedule_cleanup(None, scan_id)
+    return pdf_path
 
-    return bytes(pdf.output())
+
+def _run_report_job(fn, *args):
+    """
+    Run a reports.py builder on the report process pool and wait for it.
+    A worker that dies (OOM, segfault in Pillow) breaks the whole pool, so
+    it is replaced before the error is passed on to the caller.
+    """
+    global _report_pool
+    pool = _report_pool
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _report_pool_lock:
+            if _report_pool is pool:
+                _report_pool = ProcessPoolExecutor(max_workers=REPORT_POOL_SIZE)
+        pool.shutdown(wait=False)
+        raise
 
 
 @app.route("/api/scan/<scan_id>/evidence")
@@ -539,8 +586,8 @@ def download_evidence(scan_id):
     """Generate and return a legal evidence package as a ZIP file."""
     # Try in-memory first, then fall back to disk.
     result = None
-    if scan_id in active_scans:
-        scan = active_scans[scan_id]
+    scan = active_scans.get(scan_id)
+    if scan is not None:
         if not scan["done"] or not scan["result"]:
             return jsonify({"error": "Scan not yet complete", "retry": True}), 202
         result = scan["result"]
@@ -557,38 +604,40 @@ def download_evidence(scan_id):
             "retry": False,
         }), 400
 
-    domain = scanner.get_domain(result["url"]).replace(":", "_")
+    domain = reports.domain_for_filename(result)
     date_str = datetime.now().strftime("%Y-%m-%d")
     filename = f"{domain}_privacy_violation_evidence_{date_str}.zip"
 
     # Check for pre-generated evidence file first.
-    prebuilt_path = os.path.join(EVIDENCE_DIR, f"{scan_id}.zip")
-    if os.path.exists(prebuilt_path) and os.path.getsize(prebuilt_path) > 0:
-        with open(prebuilt_path, "rb") as f:
-            zip_bytes = f.read()
-    else:
-        # Fallback: generate on the fly.
+    zip_path = os.path.join(EVIDENCE_DIR, f"{scan_id}.zip")
+    if not (os.path.exists(zip_path) and os.path.getsize(zip_path) > 0):
+        # Fallback: generate on the fly (saved for future requests).
         try:
-            from evidence import generate_evidence_package
-            zip_bytes = generate_evidence_package(result)
-
-            # Save for future requests.
-            try:
-                with open(prebuilt_path, "wb") as f:
-                    f.write(zip_bytes)
-            except Exception:
-                pass
+            zip_path = _build_evidence_zip(scan_id, result)
         except Exception as e:
             traceback.print_exc()
             return jsonify({"error": f"Evidence generation failed: {e}", "retry": False}), 500
 
-    return Response(
-        zip_bytes,
+    # Stream it straight from disk (sendfile under gunicorn) rather than
+    # reading the whole ZIP into memory.
+    return send_file(
+        zip_path,
         mimetype="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        as_attachment=True,
+        download_name=filename,
+        conditional=True,
     )
 
 
+def _build_evidence_zip(scan_id, result):
+    """
+    Write the evidence ZIP for a scan straight to disk and return its path.
+    Built under a temp name and renamed, so readers never see a partial file.
+    """
+    zip_path = os.path.join(EVIDENCE_DIR, f"{scan_id}.zip")
+    return _run_report_job(reports.build_evidence_zip, result, zip_path)
+
+
 # ────────────────────────────────────────────────────────────────────
 # BATCH SCANNING
 # ────────────────────────────────────────────────────────────────────
@@ -612,7 +661,7 @@ def start_batch_scan():
     batch_id = str(uuid.uuid4())
     q = Queue()
 
-    active_batch_scans[batch_id] = {
+    _register(active_batch_scans, batch_id, {
         "queue": q,
         "urls": urls,
         "results": {},
@@ -620,139 +669,131 @@ def start_batch_scan():
         "current_index": 0,
         "stop_requested": False,
         "done": False,
-    }
+    })
 
     def run_batch():
         violations = 0
         clean = 0
+        completed = 0
+
+        def scan_one(i, url):
+            """Runs in an executor thread; the scan itself runs on a pool worker."""
+            if active_batch_scans[batch_id]["stop_requested"]:
+                return None
+
+            active_batch_scans[batch_id]["current_index"] = i
+
+            # Notify: starting this domain
+            _publish(q, {
+                "event": "batch_status",
+                "data": {
+                    "current_url": url,
+                    "current_index": i,
+                    "completed": completed,
+                    "total": len(urls),
+                    "message": f"Starting scan of {url}",
+                    "step": 0,
+                    "total_steps": 20,
+                },
+            })
+
+            # ── Run scan on a pooled worker with hard kill timeout ──
+            def on_status(status):
+                status["current_url"] = url
+                status["current_index"] = i
+                status["completed"] = completed
+                status["total"] = len(urls)
+                _publish(q, {"event": "batch_status", "data": status})
+
+            try:
+                return scan_pool.run(url, on_status=on_status, timeout=MAX_SCAN_TIME), False
+            except scanner.ScanTimeout:
+                return {
+                    "url": url,
+                    "still_tracking": "timeout",
+                    "tiktok_trackers_after": [],
+                    "trackers_after": [],
+                    "trackers_before": [],
+                    "opt_out_found": "unknown",
+                    "opt_out_clicked": "unknown",
+                    "error": f"Scan timed out after {MAX_SCAN_TIME}s — killed",
+                }, True
+            except Exception as e:
+                # e.g. a worker process couldn't be started. Reported like any
+                # other failed scan so the rest of the batch carries on.
+                return {
+                    "url": url,
+                    "still_tracking": "unknown",
+                    "tiktok_trackers_after": [],
+                    "error": str(e),
+                }, True
+
         try:
-            database.init_db()
-            for i, url in enumerate(urls):
-                if active_batch_scans[batch_id]["stop_requested"]:
-                    break
-
-                active_batch_scans[batch_id]["current_index"] = i
-
-                # Notify: starting this domain
-                q.put({
-                    "event": "batch_status",
-                    "data": {
-                        "current_url": url,
-                        "current_index": i,
-                        "total": len(urls),
-                        "message": f"Starting scan of {url}",
-                        "step": 0,
-                        "total_steps": 20,
-                    },
-                })
-
-                # Create a scan_id so evidence/PDF routes work
-                scan_id = str(uuid.uuid4())
-
-                # ── Run scan in separate process with hard kill timeout ──
-                mp_result_queue = multiprocessing.Queue()
-                mp_status_queue = multiprocessing.Queue()
-
-                proc = multiprocessing.Process(
-                    target=_scan_worker,
-                    args=(url, mp_result_queue, mp_status_queue),
-                )
-                proc.start()
-                start_time = time.time()
-                timed_out = False
-
-                # Relay status updates while process is alive
-                while proc.is_alive():
-                    elapsed = time.time() - start_time
-                    if elapsed > MAX_SCAN_TIME:
-                        proc.kill()
-                        proc.join()
-                        timed_out = True
-                        break
-
-                    # Drain status messages
-                    while not mp_status_queue.empty():
-                        try:
-                            status = mp_status_queue.get_nowait()
-                            status["current_url"] = url
-                            status["current_index"] = i
-                            status["total"] = len(urls)
-                            q.put({"event": "batch_status", "data": status})
-                        except Exception:
-                            break
-
-                    time.sleep(0.2)
-
-                if not timed_out:
-                    proc.join()
-
-                # Drain remaining status messages
-                while not mp_status_queue.empty():
-                    try:
-                        mp_status_queue.get_nowait()
-                    except Exception:
-                        break
-
-                if timed_out:
-                    result = {
-                        "url": url,
-                        "still_tracking": "timeout",
-                        "tiktok_trackers_after": [],
-                        "trackers_after": [],
-                        "trackers_before": [],
-                        "opt_out_found": "unknown",
-                        "opt_out_clicked": "unknown",
-                        "error": f"Scan timed out after {MAX_SCAN_TIME}s — killed",
-                    }
-                else:
-                    try:
-                        result = mp_result_queue.get(timeout=5)
-                    except Exception:
-                        result = {
-                            "url": url,
-                            "still_tracking": "unknown",
-                            "tiktok_trackers_after": [],
-                            "error": "Scan process ended without returning results",
-                        }
-
-                # Store in active_scans so existing evidence/PDF routes work
-                active_scans[scan_id] = {
-                    "queue": Queue(),
-                    "result": result,
-                    "error": None,
-                    "done": True,
+            # The pool caps how many Chromium instances run at once, so there's
+            # no point queueing more concurrent scans than it has workers.
+            max_workers = min(len(urls), SCAN_POOL_SIZE)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(scan_one, i, url): url
+                    for i, url in enumerate(urls)
                 }
-
-                active_batch_scans[batch_id]["results"][url] = result
-                active_batch_scans[batch_id]["scan_ids"][url] = scan_id
-
-                # Pre-generate evidence package in background (skip for timeouts).
-                if not timed_out:
-                    _pregenerate_evidence(scan_id, result)
-
-                st = result.get("still_tracking")
-                if st == "yes":
-                    violations += 1
-                elif st in ("timeout", "inconclusive"):
-                    pass  # Don't count as clean or violation
-                else:
-                    clean += 1
-
-                q.put({
-                    "event": "domain_complete",
-                    "data": {
-                        "url": url,
-                        "scan_id": scan_id,
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    outcome = future.result()
+                    if outcome is None:
+                        continue  # Skipped — stop was requested before it started
+                    url = futures[future]
+                    result, failed = outcome
+                    completed += 1
+
+                    # Create a scan_id so evidence/PDF routes work
+                    scan_id = str(uuid.uuid4())
+
+                    # Store in active_scans so existing evidence/PDF routes work
+                    _register(active_scans, scan_id, {
+                        "queue": Queue(),
                         "result": result,
-                    },
-                })
+                        "error": None,
+                        "done": True,
+                    })
+                    _schedule_cleanup(active_scans, scan_id)
+
+                    active_batch_scans[batch_id]["results"][url] = result
+                    active_batch_scans[batch_id]["scan_ids"][url] = scan_id
+
+                    # Pre-generate evidence package in background (skip for timeouts / errors).
+                    if not failed:
+                        _pregenerate_evidence(scan_id, result)
+
+                    st = result.get("still_tracking")
+                    if st == "yes":
+                        violations += 1
+                    elif st in ("timeout", "inconclusive"):
+                        pass  # Don't count as clean or violation
+                    else:
+                        clean += 1
+
+                    _publish(q, {
+                        "event": "domain_complete",
+                        "data": {
+                            "url": url,
+                            "scan_id": scan_id,
+                            "result": result,
+                        },
+                    })
+
+                    # Drop domains that haven't started yet; in-flight scans finish.
+                    if active_batch_scans[batch_id]["stop_requested"]:
+                        for pending in futures:
+                            pending.cancel()
 
         except Exception as e:
-            q.put({"event": "batch_error", "data": {"message": str(e)}})
+            _publish(q, {"event": "batch_error", "data": {"message": str(e)}})
 
         finally:
             stopped = active_batch_scans[batch_id]["stop_requested"]
-            q.put({
+            _publish(q, {
                 "event": "batch_complete",
                 "data": {
                     "total": len(urls),
@@ -762,7 +803,8 @@ def start_batch_scan():
                 },
             })
             active_batch_scans[batch_id]["done"] = True
-            q.put(None)
+            _publish(q, None)
+            _schedule_cleanup(active_batch_scans, batch_id)
 
     thread = threading.Thread(target=run_batch, daemon=True)
     thread.start()
@@ -774,48 +816,21 @@ def start_batch_scan():
 @app.route("/api/batch-scan/<batch_id>/stream")
 def batch_scan_stream(batch_id):
     """SSE endpoint for batch scan progress."""
-    if batch_id not in active_batch_scans:
+    batch = active_batch_scans.get(batch_id)
+    if batch is None:
         return jsonify({"error": "Batch scan not found"}), 404
 
-    def generate():
-        q = active_batch_scans[batch_id]["queue"]
-        while True:
-            try:
-                msg = q.get(timeout=120)
-                if msg is None:
-                    yield f"event: done\ndata: {json.dumps({'status': 'finished'})}\n\n"
-                    break
-                event_type = msg.get("event", "batch_status")
-                data = msg.get("data", {})
-                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
-            except Empty:
-                yield ": keepalive\n\n"
-
-        def cleanup():
-            import time
-            time.sleep(600)
-            active_batch_scans.pop(batch_id, None)
-
-        threading.Thread(target=cleanup, daemon=True).start()
-
-    return Response(
-        generate(),
-        mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
-    )
+    return _sse_response(_sse_stream(batch["queue"], "batch_status"))
 
 
 @app.route("/api/batch-scan/<batch_id>/stop", methods=["POST"])
 def stop_batch_scan(batch_id):
-    """Request a batch scan to stop after the current domain finishes."""
-    if batch_id not in active_batch_scans:
+    """Request a batch scan to stop once the domains already being scanned finish."""
+    batch = active_batch_scans.get(batch_id)
+    if batch is None:
         return jsonify({"error": "Batch scan not found"}), 404
 
-    active_batch_scans[batch_id]["stop_requested"] = True
+    batch["stop_requested"] = True
     return jsonify({"status": "stopping"})
 
 
@@ -824,7 +839,7 @@ def stop_batch_scan(batch_id):
 # ────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    database.init_db()
+    # Development server only — production runs under gunicorn (see Dockerfile).
     print("\n  Privacy Scanner Web UI")
     print("  http://localhost:8080\n")
     app.run(host="0.0.0.0", debug=False, port=8080, threaded=True)
@@ -0,0 +1,247 @@
+"""
+browser_pool.py - Long-lived Playwright worker processes for the web UI.
+
+Launching Chromium costs 300-600ms and ~150MB before the first navigation,
+so instead of starting a fresh process + browser for every scan, app.py
+keeps a small pool of worker processes that each hold ONE persistent
+Browser.  Every scan still gets its own BrowserContext (scanner.scan_url
+creates and closes one), so cookies and storage never leak between sites.
+
+The hard-kill guarantee of the old one-process-per-scan model is kept:
+if a scan exceeds its time limit, the worker running it is killed with
+SIGKILL and replaced.  Workers are also recycled after a fixed number of
+scans to bound Chromium's slow memory growth.
+"""
+
+import multiprocessing
+import threading
+import time
+from queue import Queue, Empty
+
+from playwright.sync_api import sync_playwright
+
+import database
+import scanner
+
+
+def _worker_main(task_queue, event_queue):
+    """
+    Runs in a SEPARATE PROCESS. Launches one browser, then scans every
+    (scan_id, url) task it receives until it gets the None sentinel.
+
+    Status updates and the final result go out on the same queue as
+    ("status" | "result", scan_id, payload) tuples, so they arrive in
+    order and the parent can block on a single get().
+    """
+    database.init_db()
+
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch(headless=True)
+
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            scan_id, url = task
+
+            def status_callback(message, step, total_steps, elapsed=0):
+                try:
+                    event_queue.put(("status", scan_id, {
+                        "message": message,
+                        "step": step,
+                        "total_steps": total_steps,
+                        "elapsed": round(elapsed, 1),
+                    }), block=False)
+                except Exception:
+                    pass  # Don't let queue errors kill the scan
+
+            try:
+                result = scanner.scan_url(browser, url, status_callback=status_callback)
+            except Exception as e:
+                result = {
+                    "url": url,
+                    "error": str(e),
+                    "still_tracking": "unknown",
+                    "tiktok_trackers_after": [],
+                }
+            finally:
+                # scan_url closes its own context, but an exception can skip
+                # that — never let one scan's cookies reach the next.
+                for context in list(browser.contexts):
+                    try:
+                        context.close()
+                    except Exception:
+                        pass
+            event_queue.put(("result", scan_id, result))
+
+            if not browser.is_connected():
+                break  # Chromium died — exit so the pool starts a fresh worker.
+
+        try:
+            browser.close()
+        except Exception:
+            pass
+
+
+class _Worker:
+    """One worker process plus the queues used to talk to it."""
+
+    def __init__(self, previous=None):
+        # A worker that exited on its own after the None sentinel left its
+        # queues empty and unlocked, so its replacement can take them over.
+        # A killed or crashed one may have died holding a queue lock.
+        if previous is not None and previous.exited_cleanly():
+            self.task_queue = previous.task_queue
+            self.event_queue = previous.event_queue
+        else:
+            self.task_queue = multiprocessing.Queue()
+            self.event_queue = multiprocessing.Queue()
+        self.scans_run = 0
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(self.task_queue, self.event_queue),
+            daemon=True,
+        )
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def exited_cleanly(self):
+        return not self.process.is_alive() and self.process.exitcode == 0
+
+    def kill(self):
+        """SIGKILL the worker — takes Playwright and Chromium down with it."""
+        self.process.kill()
+        self.process.join()
+
+    def stop(self, timeout=10):
+        """Ask the worker to close its browser and exit; kill it if it won't."""
+        try:
+            self.task_queue.put(None)
+        except Exception:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+
+
+class BrowserWorkerPool:
+    """
+    A fixed number of worker slots, each holding at most one live worker.
+    Each worker keeps one task queue and one event queue for its whole
+    life, and scans are tagged with a scan_id, so no queues are created
+    per scan.
+
+    Workers are started lazily on first use so importing app.py (or
+    starting gunicorn) doesn't launch Chromium until a scan needs it.
+    Callers block in run() until a slot is free, which also caps how
+    many Chromium instances can exist at once.
+    """
+
+    def __init__(self, size, recycle_after=20):
+        self.size = size
+        self.recycle_after = recycle_after
+        self._idle = Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        for _ in range(size):
+            self._idle.put(None)  # Empty slot — worker spawned on lease.
+
+    def _lease(self):
+        worker = self._idle.get()
+        if worker is None or not worker.is_alive():
+            try:
+                worker = _Worker(previous=worker)
+            except Exception:
+                self._idle.put(None)  # Don't lose the slot
+                raise
+            with self._lock:
+                self._workers.append(worker)
+        return worker
+
+    def _release(self, worker):
+        if worker.is_alive() and worker.scans_run >= self.recycle_after:
+            # Stopping waits for Chromium to shut down, so do it off the
+            # caller's thread — run() returns its result straight away and
+            # the slot comes back once the worker has exited.
+            threading.Thread(target=self._retire, args=(worker,), daemon=True).start()
+            return
+        self._return_slot(worker)
+
+    def _retire(self, worker):
+        try:
+            worker.stop()
+        finally:
+            self._return_slot(worker)
+
+    def _return_slot(self, worker):
+        # Dead workers go back into their slot too; the next lease replaces
+        # them, reusing their queues if they exited cleanly.
+        if not worker.is_alive():
+            with self._lock:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+        self._idle.put(worker)
+
+    def run(self, url, on_status=None, timeout=scanner.MAX_SCAN_TIME):
+        """
+        Scan `url` on a pooled worker and return the result dict.
+
+        `on_status` is called with each status dict as it arrives.
+        Raises scanner.ScanTimeout if the scan runs longer than `timeout`
+        seconds; the worker is killed and its slot refilled on next use.
+        """
+        worker = self._lease()
+        scan_id = f"{id(worker)}-{worker.scans_run}"
+        worker.scans_run += 1
+
+        result = None
+        try:
+            worker.task_queue.put((scan_id, url))
+            deadline = time.time() + timeout
+
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    worker.kill()
+                    raise scanner.ScanTimeout(f"Scan timed out after {timeout}s — killed")
+
+                # Sleep until the worker says something; wake at least once a
+                # second so a crashed worker is noticed.
+                try:
+                    kind, msg_scan_id, payload = worker.event_queue.get(
+                        timeout=min(remaining, 1)
+                    )
+                except Empty:
+                    if not worker.is_alive():
+                        break
+                    continue
+
+                if msg_scan_id != scan_id:
+                    continue
+                if kind == "result":
+                    result = payload
+                    break
+                if on_status:
+                    on_status(payload)
+        finally:
+            self._release(worker)
+
+        if result is None:
+            result = {
+                "url": url,
+                "still_tracking": "unknown",
+                "tiktok_trackers_after": [],
+                "error": "Scan process ended without returning results",
+            }
+        return result
+
+    def shutdown(self):
+        """Stop every live worker. Called at interpreter exit."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            if worker.is_alive():
+                worker.stop(timeout=5)
@@ -5,12 +5,40 @@ This module creates a SQLite database to store the results of privacy
 compliance scans. Each row represents one scan of one website.
 """
 
+import os
 import sqlite3
+import threading
 from datetime import datetime
 
 # The database file will be created in the same folder as this script.
 DATABASE_NAME = "scan_results.db"
 
+# One connection per process, opened on first use and shared by its threads
+# (the lock keeps them from interleaving statements). Opening a connection
+# and committing in rollback-journal mode costs more than the insert itself.
+_conn = None
+_conn_pid = None
+_conn_lock = threading.RLock()
+
+
+def _get_connection():
+    """
+    Return this process's shared connection, opening it if needed.
+
+    WAL mode lets the web server read while scan workers (separate
+    processes) write, and synchronous=NORMAL skips the fsync on every
+    commit — a crash can lose the last few scans but never corrupts the
+    file. Call with _conn_lock held.
+    """
+    global _conn, _conn_pid
+    # A forked child must not share its parent's connection.
+    if _conn is None or _conn_pid != os.getpid():
+        conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _conn, _conn_pid = conn, os.getpid()
+    return _conn
+
 
 def init_db():
     """
@@ -19,26 +47,41 @@ def init_db():
     Call this once when the program starts. It's safe to call multiple
     times — it won't erase existing data because of IF NOT EXISTS.
     """
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS scans (
-            id                      INTEGER PRIMARY KEY AUTOINCREMENT,
-            url                     TEXT    NOT NULL,
-            scan_date               TEXT    NOT NULL,
-            opt_out_found           TEXT    NOT NULL DEFAULT 'no',
-            opt_out_clicked         TEXT    NOT NULL DEFAULT 'no',
-            trackers_before_optout  TEXT    NOT NULL DEFAULT '[]',
-            trackers_after_optout   TEXT    NOT NULL DEFAULT '[]',
-            still_tracking          TEXT    NOT NULL DEFAULT 'no',
-            screenshot_path         TEXT,
-            evidence_notes          TEXT
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    with _conn_lock, _get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scans (
+                id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+                url                     TEXT    NOT NULL,
+                scan_date               TEXT    NOT NULL,
+                opt_out_found           TEXT    NOT NULL DEFAULT 'no',
+                opt_out_clicked         TEXT    NOT NULL DEFAULT 'no',
+                trackers_before_optout  TEXT    NOT NULL DEFAULT '[]',
+                trackers_after_optout   TEXT    NOT NULL DEFAULT '[]',
+                still_tracking          TEXT    NOT NULL DEFAULT 'no',
+                screenshot_path         TEXT,
+                evidence_notes          TEXT
+            )
+        """)
+
+        # get_results_for_url() looks scans up by URL, and get_still_tracking()
+        # only ever wants the violations — a partial index keeps that one small.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scans_url ON scans(url)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_scans_still_tracking
+            ON scans(still_tracking) WHERE still_tracking = 'yes'
+        """)
+
+        # Full result dicts from the web UI, keyed by its scan_id, so PDF and
+        # evidence downloads keep working after the in-memory copy expires.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scan_results (
+                scan_id     TEXT    PRIMARY KEY,
+                saved_at    TEXT    NOT NULL,
+                payload     TEXT    NOT NULL
+            )
+        """)
 
 
 def save_scan_result(
@@ -67,34 +110,28 @@ def save_scan_result(
     Returns:
         The id of the newly inserted row.
     """
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        INSERT INTO scans (
-            url, scan_date, opt_out_found, opt_out_clicked,
-            trackers_before_optout, trackers_after_optout,
-            still_tracking, screenshot_path, evidence_notes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            url,
-            datetime.now().isoformat(),
-            opt_out_found,
-            opt_out_clicked,
-            trackers_before_optout,
-            trackers_after_optout,
-            still_tracking,
-            screenshot_path,
-            evidence_notes,
-        ),
-    )
-
-    new_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return new_id
+    with _conn_lock, _get_connection() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO scans (
+                url, scan_date, opt_out_found, opt_out_clicked,
+                trackers_before_optout, trackers_after_optout,
+                still_tracking, screenshot_path, evidence_notes
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                url,
+                datetime.now().isoformat(),
+                opt_out_found,
+                opt_out_clicked,
+                trackers_before_optout,
+                trackers_after_optout,
+                still_tracking,
+                screenshot_path,
+                evidence_notes,
+            ),
+        )
+        return cursor.lastrowid
 
 
 def get_still_tracking():
@@ -106,15 +143,11 @@ def get_still_tracking():
     Returns:
         A list of dictionaries, one per matching scan.
     """
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row  # lets us access columns by name
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM scans WHERE still_tracking = 'yes'")
-    rows = [dict(row) for row in cursor.fetchall()]
-
-    conn.close()
-    return rows
+    with _conn_lock:
+        cursor = _get_connection().cursor()
+        cursor.row_factory = sqlite3.Row  # lets us access columns by name
+        cursor.execute("SELECT * FROM scans WHERE still_tracking = 'yes'")
+        return [dict(row) for row in cursor.fetchall()]
 
 
 def get_results_for_url(url):
@@ -129,15 +162,43 @@ def get_results_for_url(url):
     Returns:
         A list of dictionaries, one per matching scan.
     """
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    with _conn_lock:
+        cursor = _get_connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT * FROM scans WHERE url = ?", (url,))
+        return [dict(row) for row in cursor.fetchall()]
 
-    cursor.execute("SELECT * FROM scans WHERE url = ?", (url,))
-    rows = [dict(row) for row in cursor.fetchall()]
 
-    conn.close()
-    return rows
+def save_result_payload(scan_id, payload):
+    """
+    Store (or replace) the full result of a web UI scan.
+
+    Args:
+        scan_id: The web UI's id for the scan (a UUID string).
+        payload: The result dict, already serialized to a JSON string.
+    """
+    with _conn_lock, _get_connection() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO scan_results (scan_id, saved_at, payload) VALUES (?, ?, ?)",
+            (scan_id, datetime.now().isoformat(), payload),
+        )
+
+
+def get_result_payload(scan_id):
+    """
+    Look up the stored result of a web UI scan.
+
+    Args:
+        scan_id: The web UI's id for the scan.
+
+    Returns:
+        The result as a JSON string, or None if it was never saved.
+    """
+    with _conn_lock:
+        row = _get_connection().execute(
+            "SELECT payload FROM scan_results WHERE scan_id = ?", (scan_id,)
+        ).fetchone()
+    return row[0] if row else None
 
 
 # ── Quick test ──────────────────────────────────────────────────────
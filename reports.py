@@ -0,0 +1,305 @@
+"""
+reports.py - PDF report and evidence ZIP builders for the web UI.
+
+Building a report is CPU-bound (fpdf layout, JPEG re-encoding, ZIP
+compression), so app.py runs these functions in a pool of worker
+processes instead of on the request thread, where they would hold the
+GIL against every other request and SSE stream in the server process.
+Everything a worker needs is importable from here, without pulling in
+Flask or the scan pool.
+"""
+
+import functools
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fpdf import FPDF
+from PIL import Image
+
+import scanner
+from evidence import (
+    _sanitize_for_pdf, generate_evidence_package, generate_tiktok_evidence_images,
+)
+
+PDF_IMAGE_DPI = 150  # Print resolution for screenshots embedded in reports
+
+# Shared pool for preparing report images, so PDF builds don't pay thread
+# start-up per request and images for one report are downscaled in parallel.
+_IMAGE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+def _write_atomic(path, data):
+    """
+    Write bytes to `path` via a temp file + os.replace, so a concurrent
+    reader (or send_file) sees either the old file or the complete new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def split_flagged(flagged):
+    """Split flagged_domains into (tiktok, other) dicts in one pass."""
+    tiktok_flagged, other_flagged = {}, {}
+    for d, i in flagged.items():
+        if "tiktok" in d.lower() or "tiktok" in i.get("matched_rule", "").lower():
+            tiktok_flagged[d] = i
+        else:
+            other_flagged[d] = i
+    return tiktok_flagged, other_flagged
+
+
+def domain_for_filename(result):
+    """The scanned domain with ':' made filename-safe."""
+    return scanner.get_domain(result["url"]).replace(":", "_")
+
+
+@functools.lru_cache(maxsize=16)
+def _downscaled_jpeg(path, mtime, target_w_mm, dpi):
+    """
+    JPEG bytes of an image scaled to `target_w_mm` at `dpi`. Cached per
+    report worker process; `mtime` is only part of the key, so a screenshot
+    that changes on disk gets re-encoded.
+    """
+    target_px = round(target_w_mm / 25.4 * dpi)
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.width > target_px:
+            target_h = round(img.height * target_px / img.width)
+            img = img.resize((target_px, target_h), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=80, optimize=True)
+    return buf.getvalue()
+
+
+def _pdf_optimized(path, target_w_mm, dpi=PDF_IMAGE_DPI):
+    """
+    Return a downscaled JPEG of an image, as an in-memory file for
+    pdf.image(). fpdf embeds images at full pixel size, so full-resolution
+    PNG screenshots bloat the report for no visible gain. Falls back to the
+    original path if the copy can't be made.
+    """
+    try:
+        data = _downscaled_jpeg(path, os.path.getmtime(path), target_w_mm, dpi)
+    except Exception as e:
+        print(f"[!] Could not downscale {path} for PDF: {e}")
+        return path
+    return io.BytesIO(data)
+
+
+def _generate_pdf_report(result):
+    """Build the PDF for a scan result as a BytesIO positioned at 0. Raises on failure."""
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    # ── Title ──────────────────────────────────────────────────
+    pdf.set_font("Helvetica", "B", 22)
+    pdf.cell(0, 15, "Privacy Compliance Report", ln=True, align="C")
+    pdf.ln(3)
+
+    # ── URL and date ───────────────────────────────────────────
+    pdf.set_font("Helvetica", "", 11)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(0, 8, f"URL: {result['url']}", ln=True)
+    pdf.cell(0, 8, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
+    pdf.ln(5)
+
+    # ── Verdict banner ─────────────────────────────────────────
+    if result["still_tracking"] == "yes":
+        pdf.set_fill_color(255, 71, 87)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Helvetica", "B", 13)
+        pdf.cell(0, 12, "  VIOLATION: TikTok tracking continues after opt-out", ln=True, fill=True)
+    elif result["still_tracking"] == "inconclusive":
+        pdf.set_fill_color(255, 165, 2)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Helvetica", "B", 13)
+        pdf.cell(0, 12, "  INCONCLUSIVE: Opt-out could not be verified", ln=True, fill=True)
+    else:
+        pdf.set_fill_color(46, 213, 115)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font("Helvetica", "B", 13)
+        pdf.cell(0, 12, "  CLEAN: No TikTok tracking after opt-out", ln=True, fill=True)
+    pdf.set_text_color(0, 0, 0)
+    pdf.ln(8)
+
+    # ── Scan details ───────────────────────────────────────────
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, "Scan Details", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    pdf.cell(0, 7, f"Opt-out banner found: {result['opt_out_found']}", ln=True)
+    pdf.cell(0, 7, f"Opt-out clicked: {result['opt_out_clicked']}", ln=True)
+    pdf.cell(0, 7, f"Trackers before opt-out: {len(result['trackers_before'])}", ln=True)
+    tiktok_after = result.get("tiktok_trackers_after", [])
+    all_after = result.get("trackers_after", [])
+    tiktok_after_set = frozenset(tiktok_after)
+    other_after = [t for t in all_after if t not in tiktok_after_set]
+    pdf.cell(0, 7, f"TikTok trackers after opt-out: {len(tiktok_after)}", ln=True)
+    pdf.cell(0, 7, f"Other trackers after opt-out: {len(other_after)}", ln=True)
+    pdf.ln(5)
+
+    # ── Trackers before (list) ─────────────────────────────────
+    if result["trackers_before"]:
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 9, "Trackers Before Opt-Out:", ln=True)
+        pdf.set_font("Helvetica", "", 10)
+        for t in result["trackers_before"]:
+            pdf.cell(0, 6, _sanitize_for_pdf(f"  - {t}"), ln=True)
+        pdf.ln(3)
+
+    # ── Flagged domains table ──────────────────────────────────
+    flagged = result.get("flagged_domains", {})
+    if flagged:
+        # Split into TikTok and other trackers.
+        tiktok_flagged, other_flagged = split_flagged(flagged)
+
+        # TikTok section (primary — red highlight)
+        if tiktok_flagged:
+            pdf.set_font("Helvetica", "B", 14)
+            pdf.cell(0, 10, "TikTok Trackers (Post-Opt-Out) - VIOLATION", ln=True)
+            pdf.ln(2)
+            pdf.set_font("Helvetica", "B", 9)
+            pdf.set_fill_color(255, 71, 87)
+            pdf.set_text_color(255, 255, 255)
+            pdf.cell(85, 8, "  Domain", border=1, fill=True)
+            pdf.cell(25, 8, "Requests", border=1, fill=True, align="C")
+            pdf.cell(70, 8, "  Matched Rule", border=1, fill=True)
+            pdf.ln()
+            pdf.set_text_color(0, 0, 0)
+            pdf.set_font("Helvetica", "", 9)
+            pdf.set_fill_color(255, 240, 240)
+            for fdomain, info in sorted(tiktok_flagged.items()):
+                pdf.cell(85, 7, f"  {fdomain[:42]}", border=1, fill=True)
+                pdf.cell(25, 7, str(info["count"]), border=1, align="C", fill=True)
+                pdf.cell(70, 7, f"  {info['matched_rule'][:34]}", border=1, fill=True)
+                pdf.ln()
+            pdf.ln(5)
+
+        # Other trackers (informational — gray)
+        if other_flagged:
+            pdf.set_font("Helvetica", "B", 12)
+            pdf.set_text_color(120, 120, 120)
+            pdf.cell(0, 10, "Other Trackers Detected (Informational)", ln=True)
+            pdf.set_text_color(0, 0, 0)
+            pdf.ln(2)
+            pdf.set_font("Helvetica", "B", 9)
+            pdf.set_fill_color(100, 100, 110)
+            pdf.set_text_color(255, 255, 255)
+            pdf.cell(85, 8, "  Domain", border=1, fill=True)
+            pdf.cell(25, 8, "Requests", border=1, fill=True, align="C")
+            pdf.cell(70, 8, "  Matched Rule", border=1, fill=True)
+            pdf.ln()
+            pdf.set_text_color(120, 120, 120)
+            pdf.set_font("Helvetica", "", 9)
+            for fdomain, info in sorted(other_flagged.items()):
+                pdf.cell(85, 7, f"  {fdomain[:42]}", border=1)
+                pdf.cell(25, 7, str(info["count"]), border=1, align="C")
+                pdf.cell(70, 7, f"  {info['matched_rule'][:34]}", border=1)
+                pdf.ln()
+            pdf.set_text_color(0, 0, 0)
+            pdf.ln(5)
+
+    # ── Notes ──────────────────────────────────────────────────
+    notes = result.get("notes", [])
+    if notes:
+        # Reset cursor to left margin before multi_cell.
+        pdf.set_x(pdf.l_margin)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 9, "Notes:", ln=True)
+        pdf.set_font("Helvetica", "", 10)
+        for note in notes:
+            short = note[:200] + "..." if len(note) > 200 else note
+            pdf.set_x(pdf.l_margin)
+            pdf.multi_cell(0, 6, _sanitize_for_pdf(f"  - {short}"))
+        pdf.ln(3)
+
+    # ── Prepare images ─────────────────────────────────────────
+    screenshots = []
+    for label, key in [("Before Opt-Out", "screenshot_before"),
+                       ("After Opt-Out", "screenshot_after"),
+                       ("Product Page", "screenshot_product")]:
+        path = result.get(key)
+        if path and os.path.exists(path):
+            screenshots.append((label, path))
+
+    domain_safe = domain_for_filename(result)
+    evidence_img = os.path.join("screenshots", f"evidence_tiktok_network_{domain_safe}.png")
+    if not os.path.exists(evidence_img):
+        # Try generating it on the fly.
+        try:
+            generate_tiktok_evidence_images(result, "screenshots")
+        except Exception:
+            pass
+
+    # Downscale all images at once on the shared pool — Pillow releases
+    # the GIL while decoding/encoding, so they're prepared in parallel.
+    optimized = {
+        path: _IMAGE_POOL.submit(_pdf_optimized, path, 190)
+        for _, path in screenshots
+    }
+    if os.path.exists(evidence_img):
+        optimized[evidence_img] = _IMAGE_POOL.submit(_pdf_optimized, evidence_img, 287)
+
+    # ── Screenshots ────────────────────────────────────────────
+    for label, path in screenshots:
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.cell(0, 10, f"Screenshot: {label}", ln=True)
+        pdf.ln(3)
+        try:
+            pdf.image(optimized[path].result(), x=10, w=190)
+        except Exception:
+            pdf.set_font("Helvetica", "", 11)
+            pdf.cell(0, 10, "(Screenshot could not be embedded)", ln=True)
+
+    # ── TikTok Network Evidence (composite) ────────────────────
+    if evidence_img in optimized:
+        pdf.add_page("L")  # Landscape for wide image
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.cell(0, 10, "TikTok Network Evidence (DevTools Capture)", ln=True)
+        pdf.ln(3)
+        try:
+            pdf.image(optimized[evidence_img].result(), x=5, w=287)  # Full landscape width
+        except Exception:
+            pdf.set_font("Helvetica", "", 11)
+            pdf.cell(0, 10, "(Evidence image could not be embedded)", ln=True)
+
+    # Write straight into the buffer instead of copying pdf.output() to bytes.
+    pdf_file = io.BytesIO()
+    pdf.output(pdf_file)
+    pdf_file.seek(0)
+    return pdf_file
+
+
+def build_pdf(result, path):
+    """Generate the PDF report for a scan result and write it to `path`."""
+    pdf_file = _generate_pdf_report(result)
+    _write_atomic(path, pdf_file.getbuffer())
+    return path
+
+
+def build_evidence_zip(result, path):
+    """Write the evidence ZIP for a scan result to `path`."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        generate_evidence_package(result, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
@@ -2517,8 +2517,8 @@ def normalize_url(url):
 
 def _scan_in_process(url, result_queue):
     """Entry point for each scan subprocess. Creates its own browser."""
+    # The tables already exist — main() creates them before spawning us.
     try:
-        database.init_db()
         with sync_playwright() as pw:
             browser = pw.chromium.launch(headless=True)
             result = scan_url(browser, url)